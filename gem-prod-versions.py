@@ -1,17 +1,18 @@
-#!/usr/bin/python
+#!/usr/bin/env python3
 import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from argparse import ArgumentParser, SUPPRESS, Namespace
-from os.path import isdir
 
 from versions import IOC, SupportModule, Config
-from versions import SITE_LIST, AREA_LIST, AREA_SUPPORT, AREA_IOC, EPICS_ALL
+from versions import AREA_LIST, AREA_SUPPORT, AREA_IOC, EPICS_ALL, MAX_THREADS
 from versions import MATURITY_PROD
 from versions import get_ioc_name
 from versions import get_epics_versions, get_default_epics_version
-from versions import get_ioc_list, get_ioc_versions
-from versions import get_support_module_list, get_support_module_versions
+from versions import get_ioc_list, get_ioc_tree
+from versions import get_support_module_list, get_support_module_versions, get_support_module_tree
 from versions import skip_name, skip_exclude
-from versions import fmt, fmt_list, sort_by_name_and_version
+from versions import make_row_formatter, sort_by_name_and_version
 
 # String that will be appended to the support module or ioc name if it doesn't have any dependencies
 NO_DEP_MARK = '(-)'
@@ -30,7 +31,7 @@ def print_epics_version_list():
     :return: None
     """
     for epics in sorted(get_epics_versions(MATURITY_PROD)):
-        print epics
+        print(epics)
 
 
 def print_ioc_list(epics_version_list):
@@ -40,7 +41,7 @@ def print_ioc_list(epics_version_list):
     :type epics_version_list: list
     :return: None
     """
-    ioc_dict = {}
+    ioc_dict = defaultdict(list)
     len_max = 0
 
     # Loop over all EPICS versions and IOC's.
@@ -50,15 +51,12 @@ def print_ioc_list(epics_version_list):
     for epics_version in sorted(epics_version_list, reverse=True):
         for ioc_name in get_ioc_list(epics_version, MATURITY_PROD):
             len_max = max(len_max, len(ioc_name))
-            if ioc_name in ioc_dict:
-                ioc_dict[ioc_name].append(epics_version)
-            else:
-                ioc_dict[ioc_name] = [epics_version]
+            ioc_dict[ioc_name].append(epics_version)
 
     # Print the dictionary (formatted).
     format_string = '{0:' + str(len_max) + '}    {1}'
     for ioc_name in sorted(ioc_dict):
-        print format_string.format(ioc_name, ioc_dict[ioc_name])
+        print(format_string.format(ioc_name, ioc_dict[ioc_name]))
 
 
 def print_support_module_list(epics_version_list):
@@ -68,23 +66,20 @@ def print_support_module_list(epics_version_list):
     :type epics_version_list: list
     :return: None
     """
-    support_dict = {}
+    support_dict = defaultdict(list)
     len_max = 0
 
     # Loop over all EPICS versions and support modules (listed in reverse order).
     # Build a dictionary where each entry is the list containing the different EPICS version(s) for each IOC.
     for epics_version in sorted(epics_version_list, reverse=True):
-        for support_name in get_support_module_list(epics_version, MATURITY_PROD):
+        for support_name in sorted(get_support_module_list(epics_version, MATURITY_PROD)):
             len_max = max(len_max, len(support_name))
-            if support_name in support_dict:
-                support_dict[support_name].append(epics_version)
-            else:
-                support_dict[support_name] = [epics_version]
+            support_dict[support_name].append(epics_version)
 
     # Print the dictionary
     format_string = '{0:' + str(len_max) + '}    {1}'
     for support_name in sorted(support_dict):
-        print format_string.format(support_name, support_dict[support_name])
+        print(format_string.format(support_name, support_dict[support_name]))
 
 
 def print_ioc_dependency_report(ioc_name_list, exclude_list, epics_version_list, csv_output, latest_versions):
@@ -112,30 +107,48 @@ def print_ioc_dependency_report(ioc_name_list, exclude_list, epics_version_list,
     """
     for epics_version in epics_version_list:
 
-        # List of all IOC (target) names for the EPICS version
-        ioc_list = get_ioc_list(epics_version, MATURITY_PROD)
+        # Versions of all IOC's for the EPICS version, indexed by IOC (target) name and site
+        ioc_tree = get_ioc_tree(epics_version)
 
         # Loop over all ioc's, sites and versions for a given EPICS version.
         # Create a dictionary indexed by the tuple (ioc name, ioc version), where each
         # element of the dictionary is a list of the dependencies for the given ioc.
-        # IOC's are "matched" and "excluded" at this point.
+        # IOC's are "matched" and "excluded" at this point, once per target and site,
+        # since the ioc name does not depend on the ioc version.
         dep_dict = {}
-        for ioc_target_name in ioc_list:
-            for site in SITE_LIST:
-                for ioc_version in get_ioc_versions(ioc_target_name, epics_version, site):
-                    ioc_name = get_ioc_name(ioc_target_name, site)
-                    if skip_name(ioc_name, ioc_name_list) or skip_exclude(ioc_name, exclude_list):
-                        continue
-                    # print ioc_name, ioc_version
-                    ioc = IOC(ioc_name)
-                    ioc.set_attributes(MATURITY_PROD, epics_version, site, ioc_target_name, ioc_version)
-                    # print ioc
-                    dep_dict[(ioc_name, ioc_version)] = ioc.get_ioc_dependencies()
+        for (ioc_target_name, site), ioc_version_list in sorted(ioc_tree.items()):
+            ioc_name = get_ioc_name(ioc_target_name, site)
+            if skip_name(ioc_name, ioc_name_list) or skip_exclude(ioc_name, exclude_list):
+                continue
+            for ioc_version in ioc_version_list:
+                # print ioc_name, ioc_version
+                ioc = IOC(ioc_name)
+                ioc.set_attributes(MATURITY_PROD, epics_version, site, ioc_target_name, ioc_version)
+                # print ioc
+                dep_dict[(ioc_name, ioc_version)] = ioc.get_ioc_dependencies()
 
         _print_dependency_report(dep_dict, epics_version, csv_output, latest_versions)
 
-        if len(epics_list) > 1:
-            print '\n'
+        if len(epics_version_list) > 1:
+            print('\n')
+
+
+def _get_support_module_dependencies(support_name, epics_version):
+    """
+    Auxiliary routine used by print_support_module_dependency_report to get the dependencies
+    of all the prod versions of a support module. It is run in a thread pool.
+    :param support_name: support module name
+    :type support_name: str
+    :param epics_version: EPICS version
+    :type epics_version: str
+    :return: list of tuples ((support module name, support module version), dependency list)
+    :rtype: list
+    """
+    dep_list = []
+    for support_version in get_support_module_versions(support_name, epics_version):
+        sup = SupportModule(support_name, support_version, epics_version, MATURITY_PROD)
+        dep_list.append(((support_name, support_version), sup.get_support_module_dependencies()))
+    return dep_list
 
 
 def print_support_module_dependency_report(support_name_list, exclude_list, epics_version_list,
@@ -162,24 +175,26 @@ def print_support_module_dependency_report(support_name_list, exclude_list, epic
     :return: None
     """
     for epics_version in epics_version_list:
-        support_module_list = get_support_module_list(epics_version, MATURITY_PROD)
+        support_module_list = sorted(get_support_module_list(epics_version, MATURITY_PROD))
 
         # Loop over all support module and versions for a given EPICS version.
         # Create a dictionary indexed by the tuple (support module name, support module version),
         # where each element of the dictionary is a list of the dependencies for the support module.
         # Support modules are "matched" and "excluded" at this point.
+        # The work for each support module is I/O bound (directory listings and release files),
+        # so the support modules are processed in parallel.
+        name_list = [x for x in support_module_list
+                     if not (skip_name(x, support_name_list) or skip_exclude(x, exclude_list))]
         dep_dict = {}
-        for support_name in support_module_list:
-            if skip_name(support_name, support_name_list) or skip_exclude(support_name, exclude_list):
-                continue
-            for support_version in get_support_module_versions(support_name, epics_version):
-                sup = SupportModule(support_name, support_version, epics_version, MATURITY_PROD)
-                dep_dict[(support_name, support_version)] = sup.get_support_module_dependencies()
+        with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
+            for dep_list in executor.map(_get_support_module_dependencies, name_list,
+                                         [epics_version] * len(name_list)):
+                dep_dict.update(dep_list)
 
         _print_dependency_report(dep_dict, epics_version, csv_output, latest_versions)
 
-        if len(epics_list) > 1:
-            print '\n'
+        if len(epics_version_list) > 1:
+            print('\n')
 
 
 def _print_dependency_report(dep_dict, epics_version, csv_output, latest_versions):
@@ -196,21 +211,15 @@ def _print_dependency_report(dep_dict, epics_version, csv_output, latest_version
     :type latest_versions: bool
     :return None
     """
-    # These two variables are used to store the list of dependency names and versions
-    # in two separate dictionaries indexed by the same index used in dep_list.
-    dep_names = {}
-    dep_versions = {}
+    # This dictionary is indexed by the same index used in dep_dict. Each element is a dictionary
+    # with the versions of the dependencies, indexed by dependency name.
+    dep_map = {}
 
     # Variables used to store name, version and column lengths
     len_name_max = 0
     len_version_max = 0
-    len_dep_name_max = 0
-    len_dep_version_max = 0
     column_lengths = {}
 
-    # The reference names set is used to build a list of unique dependency names.
-    referenced_names = set()
-
     # String used to mark empty (no dependency) columns in the report
     empty_dependency_mark = EMPTY_DEPENDENCY_CSV if csv_output else EMPTY_DEPENDENCY_TEXT
 
@@ -224,18 +233,14 @@ def _print_dependency_report(dep_dict, epics_version, csv_output, latest_version
         len_name_max = max(len_name_max, len(key[0]))
         len_version_max = max(len_version_max, len(key[1]))
 
-        # Split the dependency names and versions in two separate list.
-        # The module name is stored in one list and the versions in the other.
+        # Map the dependency names to their versions.
         # This is the place where the information for each dependency is extracted.
-        dep_names[key] = [x.name for x in dep_dict[key]]
-        dep_versions[key] = [x.version for x in dep_dict[key]]
-
-        # Store the names into a set. This eliminates duplicate and empty names.
-        referenced_names.update(dep_names[key])
+        # The first occurrence of a dependency wins if it's listed more than once.
+        dep_map[key] = {x.name: x.version for x in reversed(dep_dict[key])}
 
         # Create a list of the maximum column length for each dependency.
         # This list will be used when formatting the output.
-        for name, version in zip(dep_names[key], dep_versions[key]):
+        for name, version in dep_map[key].items():
             # print name, version
             if name in column_lengths:
                 column_lengths[name] = max(column_lengths[name], max(len(name), len(version)))
@@ -243,14 +248,6 @@ def _print_dependency_report(dep_dict, epics_version, csv_output, latest_version
                 column_lengths[name] = max(len(name), len(version))
                 # print '-', name, column_lengths[name]
 
-        # Keep track of the maximum name and version length for the dependencies.
-        # Ignore those cases that don't have dependencies.
-        try:
-            len_dep_name_max = max(len_dep_name_max, len(max(dep_names[key], key=len)))
-            len_dep_version_max = max(len_dep_version_max, len(max(dep_versions[key], key=len)))
-        except ValueError:
-            pass
-
     # The maximum length of the version column depends also on the column title
     len_version_max = max(len_version_max, len(VERSION_TITLE))
 
@@ -258,20 +255,25 @@ def _print_dependency_report(dep_dict, epics_version, csv_output, latest_version
     # Add the length of the string used to mark no dependencies.
     first_column_length = max(len_name_max, len(epics_version)) + len(NO_DEP_MARK)
 
-    # Sort the set of support module names that are actually used.
+    # Build the set of unique dependency names from all the dependency maps,
+    # and sort the set of support module names that are actually used.
     # Support modules that are not used are not included in this set.
     # Thus, the report will only include columns for relevant dependencies.
-    referenced_names = sorted(referenced_names)
+    referenced_names = sorted(set().union(*dep_map.values()))
 
     # Create a list with the length of all the dependencies.
     # This list will be used while formatting the output.
     column_length_list = [column_lengths[x] for x in referenced_names]
 
+    # All the lines in the table share the same columns, so the formatting is set up only once
+    format_row = make_row_formatter([first_column_length, len_version_max] + column_length_list, csv_output)
+
+    # The report lines are collected in a list and printed all at once at the end
+    output_lines = []
+
     # Print title. The EPICS version will show up in the leftmost columns. This column will be
     # wide enough for the name and version of the support module or ioc.
-    print fmt([epics_version], first_column_length, csv_output) + \
-          fmt([VERSION_TITLE], len_version_max, csv_output) + \
-          fmt_list(referenced_names, column_length_list, csv_output)
+    output_lines.append(format_row(epics_version, VERSION_TITLE, *referenced_names))
 
     # Print support modules or iocs. There will be one line per item. The first two columns
     # will have the name and version, followed by the versions of the dependency versions.
@@ -283,22 +285,16 @@ def _print_dependency_report(dep_dict, epics_version, csv_output, latest_version
         key = (name, version)
 
         # Mark those modules with no dependencies so they are easy to identify in the output
-        if len(dep_names[key]) == 0:
+        if not dep_map[key]:
             name += NO_DEP_MARK
 
         # Loop over the referenced dependencies (the report columns).
-        # Trap those that are not a dependency.
-        column_list = []
-        for dep in referenced_names:
-            try:
-                idx = dep_names[key].index(dep)
-                column_list.append(dep_versions[key][idx])
-            except ValueError:  # no dependency
-                column_list.append(empty_dependency_mark)
+        # Mark those that are not a dependency.
+        column_list = [dep_map[key].get(dep, empty_dependency_mark) for dep in referenced_names]
 
-        print fmt([name], first_column_length, csv_output) + \
-              fmt([version], len_version_max, csv_output) + \
-              fmt_list(column_list, column_length_list, csv_output)
+        output_lines.append(format_row(name, version, *column_list))
+
+    print('\n'.join(output_lines))
 
 
 def print_what_depends_report(support_name_list, epics_version_list):
@@ -310,59 +306,58 @@ def print_what_depends_report(support_name_list, epics_version_list):
     :type epics_version_list: list
     :return:
     """
-    ioc_dict = {}
-    support_dict = {}
+    ioc_dict = defaultdict(set)
+    support_dict = defaultdict(set)
     len_max = 0
 
+    # Set used to check whether a dependency is one of the support modules we are looking for
+    support_name_set = set(support_name_list)
+
     # Loop over all available EPICS versions
     for epics_version in epics_version_list:
 
         # Support modules
-        for support_name in get_support_module_list(epics_version, MATURITY_PROD):
+        support_tree = get_support_module_tree(epics_version)
+        for support_name in sorted(support_tree):
             # if skip_name(support_name, support_name_list) or skip_exclude(support_name, exclude_list):
             #     continue
-            for support_version in get_support_module_versions(support_name, epics_version):
+            for support_version in support_tree[support_name]:
                 sup = SupportModule(support_name, support_version, epics_version, MATURITY_PROD)
                 dep_names = [x.name for x in sup.get_support_module_dependencies()]
                 # print dep_names
                 for name in dep_names:
-                    if name in support_name_list:
+                    if name in support_name_set:
                         # support_set.add(support_name)
-                        if support_name not in support_dict:
-                            support_dict[support_name] = set()
                         support_dict[support_name].add(name)
                         len_max = max(len_max, len(support_name))
         # print support_dict
 
         # IOC's
-        ioc_name_list = get_ioc_list(epics_version, MATURITY_PROD)
-        for ioc_target_name in ioc_name_list:
-            for site in SITE_LIST:
-                for ioc_version in get_ioc_versions(ioc_target_name, epics_version, site):
-                    ioc_name = get_ioc_name(ioc_target_name, site)
-                    # print ioc_name, ioc_version
-                    ioc = IOC(ioc_name)
-                    ioc.set_attributes(MATURITY_PROD, epics_version, site, ioc_target_name, ioc_version)
-                    dep_names = [x.name for x in ioc.get_ioc_dependencies()]
-                    # print dep_names
-                    for name in dep_names:
-                        if name in support_name_list:
-                            # support_set.add(support_name)
-                            if ioc_target_name not in support_dict:
-                                ioc_dict[ioc_target_name] = set()
-                            ioc_dict[ioc_target_name].add(name)
-                            len_max = max(len_max, len(ioc_target_name))
+        ioc_tree = get_ioc_tree(epics_version)
+        for (ioc_target_name, site), ioc_version_list in sorted(ioc_tree.items()):
+            ioc_name = get_ioc_name(ioc_target_name, site)
+            for ioc_version in ioc_version_list:
+                # print ioc_name, ioc_version
+                ioc = IOC(ioc_name)
+                ioc.set_attributes(MATURITY_PROD, epics_version, site, ioc_target_name, ioc_version)
+                dep_names = [x.name for x in ioc.get_ioc_dependencies()]
+                # print dep_names
+                for name in dep_names:
+                    if name in support_name_set:
+                        # support_set.add(support_name)
+                        ioc_dict[ioc_target_name].add(name)
+                        len_max = max(len_max, len(ioc_target_name))
         # print ioc_dict
 
         # Format output
         format_string = ' ' * 3 + '{0:' + str(len_max) + '}    {1}'
-        print epics_version
+        print(epics_version)
         for item in sorted(support_dict):
-            print format_string.format(str(item), str(list(support_dict[item])))
+            print(format_string.format(str(item), str(sorted(support_dict[item]))))
         for item in sorted(ioc_dict):
-            print format_string.format(str(item), str(list(ioc_dict[item])))
+            print(format_string.format(str(item), str(sorted(ioc_dict[item]))))
         if len(epics_version_list) > 1:
-            print ''
+            print('')
 
 
 def command_line_arguments(argv):
@@ -490,8 +485,8 @@ if __name__ == '__main__':
 
     # Abort if the redirector, production and work directories do not exist.
     # It doesn't make sense to continue if this information is not available.
-    if not (isdir(Config.redirector_dir()) and isdir(Config.prod_dir()) and isdir(Config.work_dir())):
-        print 'Redirector, prod and/or work directories do not exist'
+    if not Config.directories_exist():
+        print('Redirector, prod and/or work directories do not exist')
         exit(1)
 
     # Determine what version(s) of EPICS will be used based on what options were selected.
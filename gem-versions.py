@@ -1,19 +1,21 @@
-#!/usr/bin/python
+#!/usr/bin/env python3
 import sys
+from collections import defaultdict
 from argparse import ArgumentParser, SUPPRESS, Namespace
-from os.path import isdir
 
 from versions import Redirector, IOC, SupportModule, Config
 from versions import AREA_LIST, AREA_SUPPORT, AREA_IOC, EPICS_ALL
 from versions import default_ioc_version
 from versions import skip_name, skip_exclude, skip_epics
-from versions import fmt_list
+from versions import make_row_formatter
 
 
-def print_active_ioc_summary(exclude_list, epics_version_list, print_links, csv_output):
+def print_active_ioc_summary(rd, exclude_list, epics_version_list, print_links, csv_output):
     """
     Print version information for all ioc's in the redirector directory.
     There "links" output is the same as the 'configure-ioc -L' output.
+    :param rd: redirector
+    :type rd: Redirector
     :param exclude_list: list of ioc's (substrings) to exclude from the list
     :type exclude_list: list
     :param epics_version_list: list of epics versions to show in the output
@@ -23,26 +25,33 @@ def print_active_ioc_summary(exclude_list, epics_version_list, print_links, csv_
     :type csv_output: bool
     :return None
     """
-    rd = Redirector()
-    len_max = len(max(rd.get_ioc_names(), key=len))  # for formatting
+    epics_version_set = frozenset(epics_version_list)  # for faster membership tests
+    names = rd.get_ioc_names()
+    len_max = max(map(len, names)) if names else 0  # for formatting
+    format_links = make_row_formatter([len_max, None], csv_output)
+    format_details = make_row_formatter([len_max, 5, 14, 15, 13, None], csv_output)
+    output_lines = []  # printed all at once at the end
     for ioc in rd.get_ioc_list():
         assert (isinstance(ioc, IOC))
-        if skip_exclude(ioc.name, exclude_list) or skip_epics(ioc.epics, epics_version_list):
+        if skip_exclude(ioc.name, exclude_list) or skip_epics(ioc.epics, epics_version_set):
             continue
         if print_links:
             # print format_string_links.format(ioc.name, ioc.link)
-            print fmt_list([ioc.name, ioc.link], [len_max, None], csv_output)
+            output_lines.append(format_links(ioc.name, ioc.link))
         else:
             # print format_string_details.format(ioc.name, ioc.maturity, ioc.epics, ioc.bsp, ioc.version, ioc.boot)
-            print fmt_list([ioc.name, ioc.maturity, ioc.epics, ioc.bsp, ioc.version, ioc.boot],
-                           [len_max, 5, 14, 15, 13, None], csv_output)
+            output_lines.append(format_details(ioc.name, ioc.maturity, ioc.epics, ioc.bsp, ioc.version, ioc.boot))
+    if output_lines:
+        print('\n'.join(output_lines))
 
 
-def print_active_ioc_dependencies(ioc_name_list, exclude_list, epics_version_list):
+def print_active_ioc_dependencies(rd, ioc_name_list, exclude_list, epics_version_list):
     """
     Print the dependency information of ioc's in the redirector directory.
     For each ioc, it prints the ioc version, EPICS version and EPICS BSP for the ioc,
     and the list of support modules that the ioc depends on.
+    :param rd: redirector
+    :type rd: Redirector
     :param ioc_name_list: list of strings ioc names to include in the output
     :type ioc_name_list: list
     :param exclude_list: list of strings in ioc names to exclude from the output
@@ -51,25 +60,29 @@ def print_active_ioc_dependencies(ioc_name_list, exclude_list, epics_version_lis
     :type epics_version_list: list
     :return None
     """
-    rd = Redirector()
-    for ioc in rd.get_ioc_list():
+    epics_version_set = frozenset(epics_version_list)  # for faster membership tests
+    ioc_list = [ioc for ioc in rd.get_ioc_list()
+                if not (skip_name(ioc.name, ioc_name_list) or
+                        skip_exclude(ioc.name, exclude_list) or
+                        skip_epics(ioc.epics, epics_version_set))]
+    dep_map = rd.build_dependency_map(ioc_list)  # read the release files in parallel
+    format_line = '   {0:16} {1}'.format
+    for ioc in ioc_list:
         # print ioc
         assert (isinstance(ioc, IOC))
-        if skip_name(ioc.name, ioc_name_list) or \
-                skip_exclude(ioc.name, exclude_list) or \
-                skip_epics(ioc.epics, epics_version_list):
-            continue
-        print '{0} {1} {2} {3} {4}'.format(ioc.name, default_ioc_version(ioc.version, ioc.maturity),
-                                           ioc.boot, ioc.epics, ioc.bsp)
-        for support_module in ioc.get_ioc_dependencies():
-            print '   {0:16} {1}'.format(support_module.name, support_module.version)
-        print
+        print('{0} {1} {2} {3} {4}'.format(ioc.name, default_ioc_version(ioc.version, ioc.maturity),
+                                           ioc.boot, ioc.epics, ioc.bsp))
+        for support_module in dep_map[ioc.name]:
+            print(format_line(support_module.name, support_module.version))
+        print()
 
 
-def print_active_support_module_dependencies(support_name_list, exclude_list, epics_version_list):
+def print_active_support_module_dependencies(rd, support_name_list, exclude_list, epics_version_list):
     """
     Print the support module dependencies that are used by one or more ioc's.
     The report includes dependencies with other support modules and the ioc's that depend on them.
+    :param rd: redirector
+    :type rd: Redirector
     :param support_name_list: list of strings to match against support module names
     :type support_name_list: list
     :param exclude_list: list of items to exclude (no regular expressions)
@@ -83,51 +96,71 @@ def print_active_support_module_dependencies(support_name_list, exclude_list, ep
     # The ioc dictionary is used to create a cross reference between support modules and ioc objects.
     # Each entry is indexed by the support module id and contains the list of ioc's using the support module.
     # Repeated dependencies are prevented by not appending them to the list.
-    ioc_dict = {}
+    ioc_dict = defaultdict(list)
 
     # The support module dictionary is used to map support module id's with SupportModule objects.
     # Repeated dependencies will be discarded.
     sup_dict = {}
 
-    # Populate the two dictionaries. We loop over all the ioc's in the redirector directory
+    # The dependency dictionary is indexed by support module id and contains the list
+    # of support modules that the support module depends on.
+    dep_dict = {}
+
+    # The ioc version dictionary is used to store the (printable) version of each ioc,
+    # since the same ioc can be printed under several support modules.
+    ioc_version_dict = {}
+
+    # The name dictionary is indexed by support module name and contains the list of
+    # (support module id, ioc) pairs for that name. It allows matching the names only once.
+    name_dict = defaultdict(list)
+
+    # Populate the dictionaries. We loop over all the ioc's in the redirector directory
     # and then iterate over the dependencies for each ioc.
-    rd = Redirector()
-    for ioc in rd.get_ioc_list():
-        if skip_exclude(ioc.name, exclude_list) or skip_epics(ioc.epics, epics_version_list):
-            continue
-        for sup in ioc.get_ioc_dependencies():
-            sup_dict[sup.id] = sup  # repeated entries are discarded at this point
+    epics_version_set = frozenset(epics_version_list)  # for faster membership tests
+    ioc_list = [ioc for ioc in rd.get_ioc_list()
+                if not (skip_exclude(ioc.name, exclude_list) or skip_epics(ioc.epics, epics_version_set))]
+    dep_map = rd.build_dependency_map(ioc_list)  # read the release files in parallel
+    for ioc in ioc_list:
+        ioc_version_dict[ioc.name] = default_ioc_version(ioc.version, ioc.maturity)
+        for sup in dep_map[ioc.name]:
+            sup_dict.setdefault(sup.id, sup)  # repeated entries are discarded at this point
             assert (isinstance(sup, SupportModule))
             # print '  ', sup
-            if skip_name(sup.name, support_name_list):
-                continue
-            if sup.id in ioc_dict:
-                ioc_dict[sup.id].append(ioc)
-            else:
-                ioc_dict[sup.id] = [ioc]
+            name_dict[sup.name].append((sup.id, ioc))
+
+    # Keep only the support modules matching the names we are looking for,
+    # and get their dependencies (only once for each support module).
+    for name in name_dict:
+        if skip_name(name, support_name_list):
+            continue
+        for sup_id, ioc in name_dict[name]:
+            if sup_id not in dep_dict:
+                dep_dict[sup_id] = sup_dict[sup_id].get_support_module_dependencies()
+            ioc_dict[sup_id].append(ioc)
 
     # Check whether there are any ioc's that depend of the support module we are looking for.
     # An empty dictionary means either that no ioc's depend on the support module, or that
     # the support module doesn't exist at all.
     if ioc_dict:
         # Print the support module dependencies first, followed by the ioc's that use the support module
+        format_line = '   {0:16} {1:16} {2}'.format
         for sup_id in sorted(ioc_dict):
             sup = sup_dict[sup_id]
             # print '--', sup
             assert (isinstance(sup, SupportModule))
-            print sup.name, sup.version, sup.epics
+            print(sup.name, sup.version, sup.epics)
             # print support module dependencies
-            for dep in sup.get_support_module_dependencies():
+            for dep in dep_dict[sup_id]:
                 assert (isinstance(dep, SupportModule))
-                print '   {0:16} {1:16} {2}'.format(dep.name, default_ioc_version(dep.version, dep.maturity), dep.epics)
+                print(format_line(dep.name, default_ioc_version(dep.version, dep.maturity), dep.epics))
             # print ioc's that depend on the support module
             for ioc in ioc_dict[sup_id]:
                 assert (isinstance(ioc, IOC))
-                print '   {0:16} {1:16} {2}'.format(ioc.name, default_ioc_version(ioc.version, ioc.maturity), ioc.epics)
-            print
+                print(format_line(ioc.name, ioc_version_dict[ioc.name], ioc.epics))
+            print()
     else:
-        print 'support module(s) \'' + str(support_name_list) + '\'' + \
-              ' does not exist or is not used by any ioc\'s in the redirector directory'
+        print('support module(s) \'' + str(support_name_list) + '\'' +
+              ' does not exist or is not used by any ioc\'s in the redirector directory')
 
 
 def command_line_arguments(argv):
@@ -223,21 +256,24 @@ if __name__ == '__main__':
         Config.set_root_directory(args.test[0])
 
     # Abort if the redirector, production and work directories do not exist.
-    if not (isdir(Config.redirector_dir()) and isdir(Config.prod_dir()) and isdir(Config.work_dir())):
-        print 'Redirector, prod and/or work directories do not exist'
+    if not Config.directories_exist():
+        print('Redirector, prod and/or work directories do not exist')
         exit(1)
 
+    # The redirector is read only once and shared by all the reports
+    redirector = Redirector()
+
     # Print the active ioc or support module information.
     # Use a 'configure-ioc -L' like output if no names are specified
     if args.name:
         # report entries in the redirector directory (i.e. in use)
         if args.area == AREA_IOC:
-            print_active_ioc_dependencies(args.name, args.exclude, args.epics)
+            print_active_ioc_dependencies(redirector, args.name, args.exclude, args.epics)
         else:
-            print_active_support_module_dependencies(args.name, args.exclude, args.epics)
+            print_active_support_module_dependencies(redirector, args.name, args.exclude, args.epics)
 
     else:
         # 'configure-ioc -L' like output if no options are specified
-        print_active_ioc_summary(args.exclude, args.epics, args.links, args.csv)
+        print_active_ioc_summary(redirector, args.exclude, args.epics, args.links, args.csv)
 
     exit(0)
@@ -1,4 +1,4 @@
-#!/usr/bin/python
+#!/usr/bin/env python3
 """
 Auxiliary routines and classes used to handle version information.
 
@@ -11,9 +11,14 @@ Classes:
 """
 import os
 import re
+import sys
+from functools import lru_cache
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 from os import listdir, readlink
 from os import sep as directory_delimiter
-from os.path import islink, isdir, join
+from os.path import isdir, join
 
 # Software maturity values
 MATURITY_PROD = 'prod'
@@ -25,6 +30,7 @@ MATURITY_LIST = [MATURITY_PROD, MATURITY_WORK, MATURITY_TEST]
 SITE_CP = 'cp'
 SITE_MK = 'mk'
 SITE_LIST = [SITE_CP, SITE_MK]
+SITE_SET = frozenset(SITE_LIST)  # for membership tests
 
 # System types
 AREA_IOC = 'ioc'
@@ -37,24 +43,30 @@ ENV_EPICS_VERSION = 'GEM_EPICS_RELEASE'
 # Value used to indicate all versions of EPICS in reports
 EPICS_ALL = 'all'
 
-# Value returned by str.find() when there's no match
-NOT_FOUND = -1
+# Regular expressions used to parse RELEASE files (precompiled to increase speed)
+_MACRO_RE = re.compile(r'\$\(([a-zA-Z0-9_]+)\)')  # the macro name is captured in group 1
+# Assignments may use the 'export' prefix and the :=, ?= and += operators (all treated as =)
+_ASSIGN_LINE_RE = re.compile(r'^[ \t]*(?:export[ \t]+)?([a-zA-Z0-9_.-]+)[ \t]*[:?+]?=[ \t]*(\S*)',
+                             re.MULTILINE)  # name, value (one line)
+
+# Maximum number of threads used to walk the software directories
+MAX_THREADS = 8
 
 
 def _try_int(s):
     """
     Auxiliary routine used by sort_by_name_and_version() to convert string (hopefully)
     containing an integer number into an integer.
-    The string will be returned unaltered if the conversion fails.
+    The result is tagged so that numbers sort before strings (Python 3 can't compare int and str).
     :param s: input string
     :type s: str
-    :return: integer number
-    :rtype: int
+    :return: (0, integer number) or (1, unaltered string) if the conversion fails
+    :rtype: tuple
     """
     try:
-        return int(s)
+        return 0, int(s)
     except ValueError:
-        return s
+        return 1, s
 
 
 def _sort_name_and_version(tuple_list, delimiter='-'):
@@ -65,7 +77,7 @@ def _sort_name_and_version(tuple_list, delimiter='-'):
     :return: sorted list
     :rtype: list
     """
-    return sorted(tuple_list, key=lambda x: (x[0], map(_try_int, x[1].split(delimiter))))
+    return sorted(tuple_list, key=lambda x: (x[0], [_try_int(v) for v in x[1].split(delimiter)]))
 
 
 # def sort_by_name_and_version(tuple_list delimiter='-'):
@@ -94,15 +106,16 @@ def sort_by_name_and_version(tuple_list, latest_versions, delimiter='-'):
     :return: sorted list
     :rtype: list
     """
+    sorted_list = _sort_name_and_version(tuple_list, delimiter=delimiter)
     if latest_versions:
-        output_list = []
-        name_list = set([x[0] for x in tuple_list])
-        for name in name_list:
-            temp_list = [x for x in tuple_list if name == x[0]]
-            output_list.append(_sort_name_and_version(temp_list, delimiter=delimiter)[-1])
-        return sorted(output_list)
+        # The list is sorted by name and version, so the last entry for each name is the latest.
+        # Names are inserted in sorted order, so the dictionary values come out sorted as well.
+        latest_dict = {}
+        for item in sorted_list:
+            latest_dict[item[0]] = item
+        return list(latest_dict.values())
     else:
-        return _sort_name_and_version(tuple_list, delimiter=delimiter)
+        return sorted_list
 
 
 def fmt(item_list, width, csv=False, csv_delimiter=','):
@@ -120,20 +133,16 @@ def fmt(item_list, width, csv=False, csv_delimiter=','):
     :return: formatted line
     :rtype: str
     """
-    format_string = ''
+    # The items are padded and joined directly, instead of building a format string first
     if csv:
-        for n in range(len(item_list)):
-            # format_string += '{:s}' + csv_delimiter
-            format_string += '\'{' + str(n) + ':s}' + csv_delimiter
+        # Every item is quoted and followed by the delimiter, since lines are built by concatenation
+        if not item_list:
+            return ''
+        return '\'' + (csv_delimiter + '\'').join(map(str, item_list)) + csv_delimiter
+    elif width is None:
+        return ''.join([item + ' ' for item in item_list])
     else:
-        for n in range(len(item_list)):
-            if width is None:
-                # format_string += '{:s} '
-                format_string += '{' + str(n) + ':s} '
-            else:
-                # format_string += '{:' + str(width + 1) + 's} '
-                format_string += '{' + str(n) + ':' + str(width + 1) + 's} '
-    return format_string.format(*item_list)
+        return ''.join([item.ljust(width + 1) + ' ' for item in item_list])
 
 
 def fmt_list(item_list, width_list, csv=False, csv_delimiter=','):
@@ -155,19 +164,32 @@ def fmt_list(item_list, width_list, csv=False, csv_delimiter=','):
     if len(item_list) != len(width_list):
         raise IndexError
 
-    format_string = ''
     if csv:
         return fmt(item_list, 0, csv, csv_delimiter)
     else:
-        for n in range(len(item_list)):
-            # format_string += '{' + str(n) + ':' + str(width_list[n] + 1) + 's} '
-            if width_list[n] is None:
-                # format_string += '{:s} '
-                format_string += '{' + str(n) + ':s} '
-            else:
-                # format_string += '{:' + str(width_list[n] + 1) + 's} '
-                format_string += '{' + str(n) + ':' + str(width_list[n] + 1) + 's} '
-    return format_string.format(*item_list)
+        # The items are padded and joined directly, instead of building a format string first
+        return ''.join([item + ' ' if width is None else item.ljust(width + 1) + ' '
+                        for item, width in zip(item_list, width_list)])
+
+
+def make_row_formatter(width_list, csv=False, csv_delimiter=','):
+    """
+    Return a function that formats a row of items in columns, with the same output as fmt_list().
+    The format is built only once, so this should be used when many rows share the same column widths.
+    :param width_list: list of column widths (None if no fixed width is required)
+    :type width_list: list
+    :param csv: format as csv output
+    :type csv: bool
+    :param csv_delimiter: delimiter to use in csv output
+    :type csv_delimiter: str
+    :return: function taking the row items as arguments and returning the formatted line
+    :rtype: callable
+    """
+    if csv:
+        return lambda *item_list: fmt(item_list, 0, csv, csv_delimiter)
+    format_string = ''.join(['{' + str(n) + ':s} ' if width is None else '{' + str(n) + ':' + str(width + 1) + 's} '
+                             for n, width in enumerate(width_list)])
+    return format_string.format
 
 
 def skip_name(name, match_list):
@@ -182,12 +204,9 @@ def skip_name(name, match_list):
     :return: boolean value indicating whether the name should be included or not
     :rtype: bool
     """
-    skip = True
     if match_list:
-        for s in match_list:
-            if name.find(s) != NOT_FOUND:
-                skip = False
-        return skip
+        # any() stops at the first match
+        return not any(s in name for s in match_list)
     else:
         return False
 
@@ -203,10 +222,7 @@ def skip_exclude(name, exclude_list):
     :return: boolean value indicating whether the name should be excluded or not
     :rtype: bool
     """
-    for s in exclude_list:
-        if name.find(s) != NOT_FOUND:
-            return True
-    return False
+    return any(s in name for s in exclude_list)
 
 
 def skip_epics(epics_version, epics_version_list):
@@ -215,8 +231,8 @@ def skip_epics(epics_version, epics_version_list):
     It will return false if the epics version list is empty or contains EPICS_ALL.
     :param epics_version: ioc or support module epics version
     :type epics_version: str
-    :param epics_version_list: list
-    :type epics_version_list: list
+    :param epics_version_list: EPICS versions to include (a set is faster when called in a loop)
+    :type epics_version_list: list or frozenset
     :return: boolean value indicating whether the epics version should be excluded or not
     :rtype: bool
     """
@@ -255,22 +271,86 @@ def default_ioc_version(version, maturity):
     return version if maturity == MATURITY_PROD else maturity
 
 
+def _list_directory(directory):
+    """
+    Auxiliary routine used to list the contents of a directory in the software tree.
+    It returns an empty list if the directory doesn't exist. This saves the extra
+    system call needed to check whether the directory exists before listing it.
+    Other errors (e.g. permissions) are not hidden.
+    :param directory: directory name
+    :type directory: str
+    :return: sorted list of directory entries
+    :rtype: list
+    """
+    try:
+        return sorted(listdir(directory))
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def _list_subdirectories(directory):
+    """
+    Auxiliary routine used to list the subdirectories of a directory in the software tree.
+    The file type comes with the directory entries, so no extra system calls are needed to
+    skip plain files. It returns an empty list if the directory doesn't exist.
+    :param directory: directory name
+    :type directory: str
+    :return: sorted list of subdirectory names
+    :rtype: list
+    """
+    try:
+        with os.scandir(directory) as it:
+            return sorted([e.name for e in it if e.is_dir()])
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def _stat(file_name):
+    """
+    Auxiliary routine used by preload_stats(). Errors are ignored.
+    :param file_name: file name
+    :type file_name: str
+    :return: None
+    """
+    try:
+        os.stat(file_name)
+    except OSError:
+        pass
+
+
+def preload_stats(file_list):
+    """
+    Stat a list of files in parallel. The results are discarded; the only purpose of this
+    routine is to warm up the file system cache before the files are processed serially.
+    :param file_list: list of file names
+    :type file_list: list
+    :return: None
+    """
+    with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
+        for _ in executor.map(_stat, file_list):
+            pass
+
+
+@lru_cache(maxsize=None)
 def get_epics_versions(maturity):
     """
     Return the list of EPICS versions available in the production directory.
     It is assumed that the EPICS directory start with an 'R'
+    The result is cached (see Config.set_root_directory).
     :param maturity: software maturity
     :type maturity: str
-    :return: unsorted list of EPICS versions
-    :rtype: list
+    :return: EPICS versions
+    :rtype: tuple
     """
     directory = Config.maturity_directory(maturity)
-    if isdir(directory):
-        return [f for f in listdir(directory) if re.search('^R', f) and isdir(join(directory, f))]
-    else:
-        return []
+    try:
+        with os.scandir(directory) as it:
+            return tuple(sorted([e.name for e in it if e.name.startswith('R') and e.is_dir()]))
+    except (FileNotFoundError, NotADirectoryError):
+        return ()
 
 
+@lru_cache(maxsize=None)
 def get_latest_epics_version(maturity):
     """
     Return the latest version of EPICS available.
@@ -296,6 +376,70 @@ def get_default_epics_version(maturity):
     return version
 
 
+# Sort key for dependency tuples (name, version, epics, maturity)
+_name_and_version = itemgetter(0, 1)
+
+# Cache of parsed RELEASE files, indexed by the tuple (file name, modification time).
+# The oldest entries are discarded when the cache is full. The cache is shared by the
+# dependency thread pools, so it's only accessed while holding the lock.
+_release_cache = {}
+_release_cache_lock = Lock()
+_RELEASE_CACHE_SIZE = 4096
+
+
+def _parse_release_file(file_name):
+    """
+    Auxiliary routine used by get_dependencies() to parse a 'configure/RELEASE' file.
+    All references to prod and work support modules are returned, whether they exist or not.
+    The result is cached, since the same RELEASE files are read many times while building reports.
+    :param file_name: full RELEASE file name
+    :type file_name: str
+    :return: tuples (name, version, epics, maturity) with the support module references
+    :rtype: tuple
+    """
+    try:
+        key = (file_name, os.stat(file_name).st_mtime_ns)
+    except OSError:
+        return ()
+    with _release_cache_lock:
+        if key in _release_cache:
+            return _release_cache[key]
+    m = Macro()
+    output_list = []
+    # print '_parse_release_file', file_name
+    try:
+        with open(file_name, 'r') as f:
+            data = f.read()
+    except IOError:
+        return ()
+    for match in _ASSIGN_LINE_RE.finditer(data):
+        r_val = m.assign(match.group(1), match.group(2))
+        # print '+', match.group(1), r_val
+        if directory_delimiter not in r_val:
+            continue  # not a path (e.g. TOP=.. or CHECK_RELEASE=YES)
+        # Only the last components of the path are needed:
+        # .../work/<epics>/support/<name> or .../prod/<epics>/support/<name>/<version>
+        # No dependency information is available for MATURITY_TEST.
+        lst = r_val.rsplit(directory_delimiter, 5)
+        if len(lst) > 4 and lst[-4] == MATURITY_WORK:
+            epics = lst[-3]
+            name = lst[-1]
+            version = MATURITY_WORK
+            # print '=', name, version
+            output_list.append((name, version, epics, MATURITY_WORK))
+        elif len(lst) > 5 and lst[-5] == MATURITY_PROD:
+            epics = lst[-4]
+            name = lst[-2]
+            version = lst[-1]
+            output_list.append((name, version, epics, MATURITY_PROD))
+    output_list = tuple(output_list)
+    with _release_cache_lock:
+        if len(_release_cache) >= _RELEASE_CACHE_SIZE:
+            del _release_cache[next(iter(_release_cache))]
+        _release_cache[key] = output_list
+    return output_list
+
+
 def get_dependencies(file_name, prod_support, work_support):
     """
     Get system dependencies. This is done by parsing the 'configure/RELEASE' files looking
@@ -303,51 +447,21 @@ def get_dependencies(file_name, prod_support, work_support):
     provide the lists of all prod/work support modules available for the EPICS version of interest.
     :param file_name: full RELEASE file name
     :type file_name: str
-    :param prod_support: list of prod support modules available
-    :type prod_support: list
-    :param work_support: list of work support modules available
-    :type work_support: list
-    :return: list of tuples with support modules and versions
+    :param prod_support: set of prod support modules available
+    :type prod_support: frozenset
+    :param work_support: set of work support modules available
+    :type work_support: frozenset
+    :return: list of tuples with support modules and versions (in the order found in the file)
     :rtype: list
     """
-    m = Macro()
-    output_list = []
     # print 'get_dependencies', file_name
-    try:
-        f = open(file_name, 'r')
-        for line in f:
-            line = line.strip()
-            # print line
-            if re.search('^#', line):
-                continue
-            l_val, r_val = m.process_line(line)
-            # print '+', l_val, r_val
-            lst = r_val.split(directory_delimiter)
-            if len(lst) > 1:
-                if MATURITY_WORK in lst:
-                    epics = lst[-3]
-                    name = lst[-1]
-                    version = MATURITY_WORK
-                    # print '=', name, version
-                    if name in work_support:
-                        output_list.append((name, version, epics, MATURITY_WORK))
-                        # print '=', module_name, version
-                elif MATURITY_PROD in lst:
-                    epics = lst[-4]
-                    name = lst[-2]
-                    version = lst[-1]
-                    if name in prod_support:
-                        output_list.append((name, version, epics, MATURITY_PROD))
-                elif MATURITY_TEST in lst:
-                    # no dependency information available for MATURITY_TEST
-                    pass
-        f.close()
-        # print '--', output_list
-        return sorted(output_list)
-    except IOError:
-        return []
+    output_list = [t for t in _parse_release_file(file_name)
+                   if t[0] in (work_support if t[3] == MATURITY_WORK else prod_support)]
+    # print '--', output_list
+    return output_list
 
 
+@lru_cache(maxsize=None)
 def get_ioc_list(epics_version, maturity):
     """
     Return the list of ioc's available for a given EPICS version
@@ -355,17 +469,13 @@ def get_ioc_list(epics_version, maturity):
     :type epics_version: str
     :param maturity: software maturity ('prod' or 'work')
     :type maturity: str
-    :return: list of ioc (target) names available for the given EPICS version
-    :rtype: list
+    :return: ioc (target) names available for the given EPICS version
+    :rtype: tuple
     """
     # print 'ioc_list', epics_version, maturity
     directory = join(Config.maturity_directory(maturity), epics_version, 'ioc')
     # print directory
-    if isdir(directory):
-        return sorted(listdir(directory))
-    else:
-        return []
-    pass
+    return tuple(_list_directory(directory))
 
 
 def get_ioc_versions(ioc_target_name, epics_version, site):
@@ -383,29 +493,29 @@ def get_ioc_versions(ioc_target_name, epics_version, site):
     """
     directory = join(Config.maturity_directory(MATURITY_PROD), epics_version, 'ioc', ioc_target_name, site)
     # print directory
-    if isdir(directory):
-        return sorted(listdir(directory))
-    else:
-        return []
+    return _list_directory(directory)
 
 
+@lru_cache(maxsize=None)
 def get_support_module_list(epics_version, maturity):
     """
     Return the list of support modules available for a given EPICS version
+    The result is cached, since the list is needed for every ioc and support module dependency lookup.
+    The result is a set, since it's mostly used to check whether a support module exists.
     :param epics_version: EPICS version
     :type epics_version: str
     :param maturity: software maturity ('prod' or 'work')
     :type maturity: str
-    :return: list of support modules available for the given EPICS version
-    :rtype: list
+    :return: support modules available for the given EPICS version (unsorted)
+    :rtype: frozenset
     """
     # print 'get_support_module_list', epics_version, maturity
     directory = join(Config.maturity_directory(maturity), epics_version, 'support')
     # print directory
-    if isdir(directory):
-        return sorted(listdir(directory))
-    else:
-        return []
+    try:
+        return frozenset(listdir(directory))
+    except (FileNotFoundError, NotADirectoryError):
+        return frozenset()
 
 
 def get_support_module_versions(support_module_name, epics_version):
@@ -420,10 +530,42 @@ def get_support_module_versions(support_module_name, epics_version):
     :rtype: list
     """
     directory = join(Config.maturity_directory(MATURITY_PROD), epics_version, 'support', support_module_name)
-    if isdir(directory):
-        return sorted(listdir(directory))
-    else:
-        return []
+    return _list_directory(directory)
+
+
+def get_ioc_tree(epics_version):
+    """
+    Get the versions of all ioc's available in prod for a given EPICS version.
+    The ioc directory is walked only once, instead of checking every ioc and site separately.
+    Only the sites in SITE_LIST are included.
+    :param epics_version: EPICS version
+    :type epics_version: str
+    :return: dictionary indexed by the tuple (ioc target name, site), containing the list of versions
+    :rtype: dict
+    """
+    ioc_tree = {}
+    directory = join(Config.maturity_directory(MATURITY_PROD), epics_version, 'ioc')
+    for ioc_target_name in _list_subdirectories(directory):
+        for site in _list_directory(join(directory, ioc_target_name)):
+            if site in SITE_SET:
+                ioc_tree[(ioc_target_name, site)] = _list_directory(join(directory, ioc_target_name, site))
+    return ioc_tree
+
+
+def get_support_module_tree(epics_version):
+    """
+    Get the versions of all support modules available in prod for a given EPICS version.
+    The support directory is walked only once, instead of checking every support module separately.
+    :param epics_version: EPICS version
+    :type epics_version: str
+    :return: dictionary indexed by support module name, containing the list of versions
+    :rtype: dict
+    """
+    directory = join(Config.maturity_directory(MATURITY_PROD), epics_version, 'support')
+    support_name_list = _list_subdirectories(directory)
+    preload_stats([join(directory, x) for x in support_name_list])
+    return {support_name: _list_directory(join(directory, support_name))
+            for support_name in support_name_list}
 
 
 class Config:
@@ -439,6 +581,9 @@ class Config:
     # Root directory (used by other routines in this class)
     root_dir = DEFAULT_DIR
 
+    # Directory names built from the root directory, indexed by directory type
+    _path_cache = {}
+
     def __init__(self):
         pass
 
@@ -451,6 +596,27 @@ class Config:
         :return: None
         """
         cls.root_dir = root_directory
+        cls._path_cache.clear()
+        # Cached listings belong to the old root directory
+        get_epics_versions.cache_clear()
+        get_latest_epics_version.cache_clear()
+        get_ioc_list.cache_clear()
+        get_support_module_list.cache_clear()
+
+    @classmethod
+    def _cached_path(cls, name, *path_list):
+        """
+        Return a directory below the root directory. The directory name is built only once.
+        :param name: directory type (used as the cache index)
+        :type name: str
+        :param path_list: directory components below the root directory
+        :return: full directory path
+        :rtype: str
+        """
+        path = cls._path_cache.get(name)
+        if path is None:
+            path = cls._path_cache[name] = join(cls.root_dir, *path_list)
+        return path
 
     @classmethod
     def prod_dir(cls):
@@ -459,7 +625,7 @@ class Config:
         :return: production directory
         :rtype: str
         """
-        return join(cls.root_dir, MATURITY_PROD)
+        return cls._cached_path(MATURITY_PROD, MATURITY_PROD)
 
     @classmethod
     def work_dir(cls):
@@ -468,7 +634,7 @@ class Config:
         :return: work directory
         :rtype: str
         """
-        return join(cls.root_dir, MATURITY_WORK)
+        return cls._cached_path(MATURITY_WORK, MATURITY_WORK)
 
     @classmethod
     def test_dir(cls):
@@ -477,7 +643,7 @@ class Config:
         :return: test directory
         :rtype: str
         """
-        return join(cls.root_dir, MATURITY_TEST)
+        return cls._cached_path(MATURITY_TEST, MATURITY_TEST)
 
     @classmethod
     def redirector_dir(cls):
@@ -486,7 +652,17 @@ class Config:
         :return: redirector directory
         :rtype: str
         """
-        return join(cls.prod_dir(), 'redirector')
+        return cls._cached_path('redirector', MATURITY_PROD, 'redirector')
+
+    @classmethod
+    def directories_exist(cls):
+        """
+        Check whether the redirector, production and work directories exist.
+        None of the reports can be produced without them.
+        :return: True if all the directories exist
+        :rtype: bool
+        """
+        return isdir(cls.redirector_dir()) and isdir(cls.prod_dir()) and isdir(cls.work_dir())
 
     @classmethod
     def maturity_directory(cls, maturity):
@@ -514,22 +690,8 @@ class Macro:
     def __init__(self):
         """
         The macro dictionary is used to keep track of the macros defined so far.
-        The macro regular expression is precompiled to increase speed.
         """
         self.macro_dictionary = {}
-        self.pattern = re.compile(r'\$\([a-zA-Z0-9_]+\)')
-
-    @staticmethod
-    def _cleaned_macro(macro):
-        """
-        Extract macro name from a macro reference.
-        It strips the dollar sign and the parentheses from the definition.
-        :param macro: macro definition (e.g. $(EPICS_RELEASE))
-        :type macro: str
-        :return: macro name (e.g. EPICS_RELEASE)
-        :rtype: str
-        """
-        return re.sub('[$(){}]', '', macro).strip()
 
     def _replace_macros(self, line):
         """
@@ -540,16 +702,25 @@ class Macro:
         :rtype: str
         """
         # print "_replace_macros", line
-        # Look for matches only if there are macros in the dictionary
-        if self.macro_dictionary:
-            match_list = self.pattern.finditer(line)
-            for match in match_list:
-                macro_name = self._cleaned_macro(match.group())
-                # print '++ match', macro_name, self.macro_dictionary
-                if macro_name in self.macro_dictionary:
-                    pattern = r'\$\(' + macro_name + r'\)'
-                    line = re.sub(pattern, self.macro_dictionary[macro_name], line)
-        return line
+        # Look for matches only if there are macros in the dictionary and the line references one.
+        # Undefined macros are left unchanged.
+        if not self.macro_dictionary or '$(' not in line:
+            return line
+        return _MACRO_RE.sub(lambda m: self.macro_dictionary.get(m.group(1), m.group(0)), line)
+
+    def assign(self, name, value):
+        """
+        Define a macro. Macros referenced in the value are replaced before the definition is stored.
+        :param name: macro name
+        :type name: str
+        :param value: macro value
+        :type value: str
+        :return: value with replaced macros
+        :rtype: str
+        """
+        value = self._replace_macros(value)
+        self.macro_dictionary[name] = value
+        return value
 
     def process_line(self, line):
         """
@@ -559,13 +730,12 @@ class Macro:
         :rtype: str
         """
         # print 'process', line
-        if re.search('.*=.*', line):
-            l_val, r_val = line.split('=')
+        if '=' in line:
+            l_val, r_val = line.split('=', 1)
             l_val = l_val.strip()
             r_val = r_val.strip()
             # print '--', l_val, r_val
-            r_val = self._replace_macros(r_val)
-            self.macro_dictionary[l_val] = r_val
+            r_val = self.assign(l_val, r_val)
             # line = self._replace_macros(line)
         else:
             l_val, r_val = line, ''
@@ -578,19 +748,41 @@ class Redirector:
     def __init__(self):
         """
         Initializes the Redirector object. It builds the list of all IOCs in the redirector directory.
-        IOC objects are stored in a dictionary indexed by the ioc name.
+        IOC objects are stored in a dictionary indexed by the ioc name, in name order.
         The IOC objects contain all the information that can be extracted from the IOC links.
         """
         self.ioc_dict = {}
         ioc_name_list = self._get_redirector_links()
         # print ioc_name_list
-        for ioc_name in ioc_name_list:
+        # The links are read in parallel, since reading them is I/O bound
+        with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
+            link_list = list(executor.map(self._get_ioc_link, ioc_name_list))
+        for ioc_name, ioc_link in zip(ioc_name_list, link_list):
             ioc = IOC(ioc_name)
-            ioc.set_attributes_from_link(self._get_ioc_link(ioc_name))
+            ioc.set_attributes_from_link(ioc_link)
             self.ioc_dict[ioc_name] = ioc
+        # The name and object lists are built only once, since the reports use them repeatedly
+        self._ioc_names = tuple(self.ioc_dict)
+        self._ioc_list = tuple(self.ioc_dict.values())
+
+    def build_dependency_map(self, ioc_list=None):
+        """
+        Get the dependencies of the IOCs in the redirector directory in parallel,
+        since reading the release files is I/O bound.
+        The dependencies are also cached in each IOC object.
+        :param ioc_list: list of IOC objects (all the IOCs in the redirector directory if None)
+        :type ioc_list: list
+        :return: dictionary indexed by ioc name, containing the list of SupportModule objects
+        :rtype: dict
+        """
+        if ioc_list is None:
+            ioc_list = self._ioc_list
+        with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
+            dep_list = list(executor.map(lambda ioc: ioc.get_ioc_dependencies(), ioc_list))
+        return {ioc.name: deps for ioc, deps in zip(ioc_list, dep_list)}
 
     def __str__(self):
-        return str(self.ioc_dict.keys())
+        return str(list(self.ioc_dict.keys()))
 
     def get_ioc(self, ioc_name):
         """
@@ -600,25 +792,26 @@ class Redirector:
         :return: IOC object
         :rtype IOC
         """
-        return self.ioc_dict[ioc_name] if ioc_name in self.ioc_dict else None
+        return self.ioc_dict.get(ioc_name)
 
     def get_ioc_names(self):
         """
         Return the list of IOC names in the redirector directory.
-        :return: list of names
-        :rtype: list
+        The dictionary is built in name order, so no sorting is needed.
+        :return: sorted names
+        :rtype: tuple
         """
         # print 'get_ioc_names', self.ioc_name_list
-        return sorted(self.ioc_dict.keys())
+        return self._ioc_names
 
     def get_ioc_list(self):
         """
         Return the list of IOC objects in the redirector directory.
         The list is built when the Redirector object is constructed.
-        :return: list of IOC objects
-        :rtype: list
+        :return: IOC objects, sorted by name
+        :rtype: tuple
         """
-        return sorted(self.ioc_dict.values(), key=lambda x: x.name)
+        return self._ioc_list
 
     @staticmethod
     def _get_redirector_links():
@@ -627,13 +820,11 @@ class Redirector:
         :return: list of links
         :rtype: list
         """
-        # print 'get_redirector_links', exclude_list
+        # print 'get_redirector_links'
         redirector_directory = Config.redirector_dir()
         if isdir(redirector_directory):
-            file_list = [f for f in listdir(redirector_directory) if islink(join(redirector_directory, f))]
-            # if exclude_list:
-            #     m = re.compile('|'.join(exclude_list))
-            #     file_list = [f for f in file_list if m.search(f) is None]
+            with os.scandir(redirector_directory) as it:
+                file_list = [e.name for e in it if e.is_symlink()]
             # print '==', file_list
             return sorted(file_list)
         else:
@@ -650,9 +841,9 @@ class Redirector:
         :rtype: str
         """
         full_file_name = join(Config.redirector_dir(), ioc_name)
-        if islink(full_file_name):
-            return readlink(full_file_name)
-        else:
+        try:
+            return readlink(full_file_name)  # fails if the file is not a link
+        except OSError:
             raise IOError(full_file_name + ' is not a link')
 
 
@@ -669,28 +860,39 @@ class IOC:
     boot:          IOC boot image (e.g. gcal-cp-ioc.boot)
     """
 
+    # Slots are used since there is one object per link or dependency
+    __slots__ = ('name', 'maturity', 'epics', 'site', 'target_name', 'version', 'bsp', 'boot', 'link',
+                 '_dependencies')
+
     # def __init__(self, ioc_name):
     def __init__(self, ioc_name):
         self.name = ioc_name
         (self.maturity, self.epics, self.site, self.target_name, self.version,
          self.bsp, self.boot, self.link) = ('', '', '', '', '', '', '', '')
+        self._dependencies = None  # cached by get_ioc_dependencies()
         # self.link = ioc_link
         # (self.maturity, self.epics, self.site, self.target_name, self.version,
         #  self.bsp, self.boot) = self._split_ioc_link(ioc_link)
 
     def set_attributes(self, maturity, epics, site, target_name, version, bsp='', boot=''):
-        self.maturity = maturity
-        self.epics = epics
-        self.site = site
+        self.maturity = sys.intern(maturity)
+        self.epics = sys.intern(epics)
+        self.site = sys.intern(site)
         self.target_name = target_name
         self.version = version
         self.bsp = bsp
         self.boot = boot
+        self._dependencies = None
 
     def set_attributes_from_link(self, ioc_link):
         self.link = ioc_link
-        (self.maturity, self.epics, self.site, self.target_name, self.version,
+        (maturity, epics, site, self.target_name, self.version,
          self.bsp, self.boot) = self._split_ioc_link(ioc_link)
+        # These values are shared by many objects
+        self.maturity = sys.intern(maturity)
+        self.epics = sys.intern(epics)
+        self.site = sys.intern(site)
+        self._dependencies = None
 
     def __str__(self):
         """
@@ -724,22 +926,21 @@ class IOC:
         :rtype: tuple
         """
         lst = link.split(directory_delimiter)
-        # print len(lst), lst, lst[2]
-        maturity = lst[2] if len(lst) > 2 else MATURITY_TEST
-        if maturity not in MATURITY_LIST:
-            maturity = MATURITY_TEST
-        if maturity != MATURITY_TEST:
-            epics_version = lst[3] if len(lst) > 3 else ''
-            ioc_target_name = lst[5] if len(lst) > 5 else ''
-            ioc_site = lst[6] if len(lst) > 6 else ''
-            ioc_version = lst[7] if len(lst) > 7 and maturity == MATURITY_PROD else ''
+        n = len(lst)
+        # print n, lst
+        maturity = lst[2] if n > 2 else MATURITY_TEST
+        if maturity == MATURITY_PROD or maturity == MATURITY_WORK:
+            # /gem_sw/<maturity>/<epics>/ioc/<target>/<site>/<version>/... (no version in work)
+            # Short (ill-formed) links are padded so that all the positions exist.
+            if n < 8:
+                lst = lst + [''] * (8 - n)
+            epics_version, ioc_target_name, ioc_site = lst[3], lst[5], lst[6]
+            ioc_version = lst[7] if maturity == MATURITY_PROD else ''
         else:
-            epics_version = ''
-            ioc_target_name = ''
-            ioc_site = ''
-            ioc_version = ''
-        epics_bsp = lst[-2] if len(lst) > 1 else ''
-        ioc_boot = lst[-1] if len(lst) > 0 else ''
+            maturity = MATURITY_TEST
+            epics_version = ioc_target_name = ioc_site = ioc_version = ''
+        epics_bsp = lst[n - 2] if n > 1 else ''
+        ioc_boot = lst[n - 1]
         return maturity, epics_version, ioc_site, ioc_target_name, ioc_version, epics_bsp, ioc_boot
 
     def _get_ioc_release_file(self):
@@ -768,10 +969,7 @@ class IOC:
         if self.maturity == MATURITY_PROD:
             directory = join(Config.prod_dir(), self.epics, 'ioc', self.target_name, self.site)
             # print directory
-            if isdir(directory):
-                return listdir(directory)
-            else:
-                return []  # no versions available
+            return _list_directory(directory)  # empty if no versions available
         else:
             return []  # no versions in work
 
@@ -779,9 +977,12 @@ class IOC:
         """
         Get the list of dependencies of the IOC to other support module.
         The list will be empty if there are no dependencies.
+        The list is computed only once and cached in the object.
         :return: list of SupportModule objects
         :rtype: list
         """
+        if self._dependencies is not None:
+            return self._dependencies
         # print 'get_ioc_dependencies', ioc_target_name
         release_file = self._get_ioc_release_file()
         # print '-', release_file
@@ -790,9 +991,10 @@ class IOC:
                                         get_support_module_list(self.epics, MATURITY_WORK))
         # print '+', self.name, support_list
         if support_list:
-            return [SupportModule(t[0], t[1], t[2], t[3]) for t in sorted(support_list)]
+            self._dependencies = [SupportModule(*t) for t in sorted(support_list, key=_name_and_version)]
         else:
-            return []  # no dependencies
+            self._dependencies = []  # no dependencies
+        return self._dependencies
 
 
 class SupportModule:
@@ -807,12 +1009,27 @@ class SupportModule:
     id:        support module id
     """
 
+    # Slots are used since there is one object per dependency
+    __slots__ = ('name', 'version', 'epics', 'maturity', '_id', '_dependencies')
+
     def __init__(self, support_name, support_version, support_epics, support_maturity):
-        self.name = support_name
+        self.name = sys.intern(support_name)  # shared by many objects
         self.version = support_version
-        self.epics = support_epics
-        self.maturity = support_maturity
-        self.id = (self.name, self.version, self.epics, self.maturity)
+        self.epics = sys.intern(support_epics)
+        self.maturity = sys.intern(support_maturity)
+        self._id = None  # built by the id property when needed
+        self._dependencies = None  # cached by get_support_module_dependencies()
+
+    @property
+    def id(self):
+        """
+        Support module id. It is built the first time it's used, since most objects never need it.
+        :return: support module id
+        :rtype: tuple
+        """
+        if self._id is None:
+            self._id = (self.name, self.version, self.epics, self.maturity)
+        return self._id
 
     def __str__(self):
         """
@@ -842,18 +1059,22 @@ class SupportModule:
         """
         Get the dependencies of support module dependencies to other support modules.
         The list will be empty if there are no dependencies.
+        The list is computed only once and cached in the object.
         :return: list of SupportModule objects
         :rtype: list
         """
+        if self._dependencies is not None:
+            return self._dependencies
         release_file = self._get_support_release_file()
         support_list = get_dependencies(release_file,
                                         get_support_module_list(self.epics, MATURITY_PROD),
                                         get_support_module_list(self.epics, MATURITY_WORK))
         # print support_list
         if support_list:
-            return [SupportModule(t[0], t[1], t[2], t[3]) for t in support_list]
+            self._dependencies = [SupportModule(*t) for t in sorted(support_list, key=_name_and_version)]
         else:
-            return []  # no dependencies
+            self._dependencies = []  # no dependencies
+        return self._dependencies
 
 
 if __name__ == '__main__':